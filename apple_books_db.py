@@ -0,0 +1,48 @@
+"""
+Apple Books DB - Shared helpers for reading Apple Books sqlite databases
+"""
+import sqlite3
+from pathlib import Path
+
+
+# Seconds between the Unix epoch and Apple's Core Data epoch (2001-01-01)
+APPLE_EPOCH_OFFSET = 978307200.0
+
+# The databases belong to Apple Books, so never write to them (query_only),
+# and favour memory-mapped reads and a large page cache for the scans.
+READONLY_PRAGMAS = (
+    "PRAGMA query_only = 1",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -200000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def open_readonly(path: Path) -> sqlite3.Connection:
+    """Open an Apple Books sqlite database tuned for read-only access"""
+    conn = sqlite3.connect(path)
+    try:
+        for pragma in READONLY_PRAGMAS:
+            conn.execute(pragma)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+def apple_time_sql(column: str) -> str:
+    """
+    Build a SQL expression formatting an Apple timestamp column as local time
+    
+    Lets SQLite do the conversion in C during the query; 0 and NULL map to NULL.
+    
+    Args:
+        column: Column holding seconds since the Apple epoch
+        
+    Returns:
+        strftime() expression yielding "%Y-%m-%d %H:%M:%S"
+    """
+    return (
+        f"strftime('%Y-%m-%d %H:%M:%S', NULLIF({column}, 0) + {APPLE_EPOCH_OFFSET}, "
+        f"'unixepoch', 'localtime')"
+    )
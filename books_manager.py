@@ -5,6 +5,11 @@ import json
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 TARGET_BOOKS_FILE = Path(__file__).parent / "target_books.json"
 
@@ -13,14 +18,17 @@ def load_target_books() -> list[dict]:
     """Load target_books.json"""
     if not TARGET_BOOKS_FILE.exists():
         return []
-    with open(TARGET_BOOKS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if orjson is not None:
+        return orjson.loads(TARGET_BOOKS_FILE.read_bytes())
+    return json.loads(TARGET_BOOKS_FILE.read_bytes())
 
 
 def save_target_books(books: list[dict]) -> None:
     """Save target_books.json"""
-    with open(TARGET_BOOKS_FILE, "w", encoding="utf-8") as f:
-        json.dump(books, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        TARGET_BOOKS_FILE.write_bytes(orjson.dumps(books, option=orjson.OPT_INDENT_2))
+        return
+    TARGET_BOOKS_FILE.write_text(json.dumps(books, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
 def sync_from_apple_books(apple_books: list[dict]) -> list[dict]:
@@ -28,31 +36,21 @@ def sync_from_apple_books(apple_books: list[dict]) -> list[dict]:
     Sync book list from Apple Books, preserving existing sync status and alias
     
     Args:
-        apple_books: Book list read from Apple Books
+        apple_books: Book list read from Apple Books, updated in place
         
     Returns:
         Merged book list
     """
-    existing = {book["asset_id"]: book for book in load_target_books()}
+    # Only sync and alias are carried over, so keep just those per asset_id
+    existing_settings = {
+        book["asset_id"]: (book.get("sync", False), book.get("alias", ""))
+        for book in load_target_books()
+    }
     
-    result = []
     for book in apple_books:
-        asset_id = book["asset_id"]
-        if asset_id in existing:
-            merged = {
-                **book,
-                "sync": existing[asset_id].get("sync", False),
-                "alias": existing[asset_id].get("alias", ""),
-            }
-            result.append(merged)
-        else:
-            result.append({
-                **book,
-                "sync": False,
-                "alias": "",
-            })
+        book["sync"], book["alias"] = existing_settings.get(book["asset_id"], (False, ""))
     
-    return result
+    return apple_books
 
 
 def get_books_to_sync() -> list[dict]:
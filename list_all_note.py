@@ -1,21 +1,15 @@
 """
 List All Notes - Read Apple Books annotations (highlights & notes)
 """
+import atexit
 import sqlite3
+import sys
+from functools import lru_cache
 from pathlib import Path
-from datetime import datetime
 from collections import defaultdict
+from typing import Iterator
 
-
-def convert_apple_time(timestamp):
-    """Apple timestamp conversion function"""
-    if not timestamp:
-        return None
-    apple_epoch = datetime(2001, 1, 1)
-    unix_epoch = datetime(1970, 1, 1)
-    offset = (apple_epoch - unix_epoch).total_seconds()
-    created_datetime = datetime.fromtimestamp(timestamp + offset)
-    return created_datetime.strftime("%Y-%m-%d %H:%M:%S")
+from apple_books_db import apple_time_sql, open_readonly
 
 
 def get_annotation_db_path() -> Path:
@@ -40,65 +34,154 @@ def get_library_db_path() -> Path:
     return library_files[0]
 
 
+ANNOTATIONS_QUERY = f"""
+    SELECT
+        a.ZANNOTATIONSELECTEDTEXT AS text,
+        a.ZANNOTATIONNOTE AS note,
+        {apple_time_sql("a.ZANNOTATIONCREATIONDATE")} AS created_at,
+        a.ZANNOTATIONASSETID AS asset_id,
+        b.ZTITLE AS title,
+        b.ZAUTHOR AS author
+    FROM ZAEANNOTATION a
+    LEFT JOIN library.ZBKLIBRARYASSET b
+        ON a.ZANNOTATIONASSETID = b.ZASSETID
+    WHERE (a.ZANNOTATIONSELECTEDTEXT IS NOT NULL
+           OR a.ZANNOTATIONNOTE IS NOT NULL)
+      {{asset_filter}}
+    ORDER BY a.ZANNOTATIONCREATIONDATE ASC
+"""
+
+
+@lru_cache(maxsize=1)
+def _get_connection() -> sqlite3.Connection:
+    """
+    Open the annotation DB once per process, with the library DB attached
+    
+    sqlite3 caches prepared statements per connection keyed by SQL text,
+    so reusing the connection lets repeated queries skip parsing and planning.
+    """
+    conn = open_readonly(get_annotation_db_path())
+    conn.row_factory = sqlite3.Row
+    conn.execute("ATTACH DATABASE ? AS library", (str(get_library_db_path()),))
+    atexit.register(conn.close)
+    return conn
+
+
+def _iter_annotations(asset_filter: str = "", params: tuple = ()) -> Iterator[tuple[str, dict]]:
+    """
+    Run the annotations SELECT with an optional extra predicate, yielding rows lazily
+    
+    Args:
+        asset_filter: Extra "AND ..." clause appended to the WHERE
+        params: Bound parameters for asset_filter
+        
+    Yields:
+        (asset_id, annotation) pairs
+    """
+    cursor = _get_connection().execute(ANNOTATIONS_QUERY.format(asset_filter=asset_filter), params)
+    
+    # Iterate the cursor instead of fetchall() so SQLite steps one row at a time
+    for row in cursor:
+        if row["asset_id"]:
+            yield row["asset_id"], {
+                "text": row["text"] or "",
+                "note": row["note"] or "",
+                "created_at": row["created_at"],
+                "title": row["title"],
+                "author": row["author"],
+            }
+
+
+def iter_annotations(asset_id: str | None = None) -> Iterator[tuple[str, dict]]:
+    """
+    Stream annotations without materializing the whole library
+    
+    Args:
+        asset_id: Only yield annotations of this book if given
+        
+    Yields:
+        (asset_id, annotation) pairs in creation order
+    """
+    if asset_id is None:
+        return _iter_annotations()
+    return _iter_annotations("AND a.ZANNOTATIONASSETID = ?", (asset_id,))
+
+
+@lru_cache(maxsize=1)
 def get_all_annotations() -> dict[str, list[dict]]:
     """
     Get all annotations, grouped by asset_id
     
+    The result is cached for the lifetime of the process, so repeated
+    lookups don't re-open the databases and re-run the JOIN.
+    Call get_all_annotations.cache_clear() to force a reload.
+    
     Returns:
         dict: Key is asset_id, value is the list of annotations for that book
     """
-    annotation_db_path = get_annotation_db_path()
-    library_db_path = get_library_db_path()
-    
-    conn = sqlite3.connect(annotation_db_path)
-    cursor = conn.cursor()
-    cursor.execute(f"ATTACH DATABASE '{library_db_path}' AS library")
-    
-    cursor.execute("""
-        SELECT
-            a.ZANNOTATIONSELECTEDTEXT,
-            a.ZANNOTATIONNOTE,
-            a.ZANNOTATIONCREATIONDATE,
-            a.ZANNOTATIONASSETID,
-            b.ZTITLE,
-            b.ZAUTHOR
-        FROM ZAEANNOTATION a
-        LEFT JOIN library.ZBKLIBRARYASSET b
-            ON a.ZANNOTATIONASSETID = b.ZASSETID
-        WHERE a.ZANNOTATIONSELECTEDTEXT IS NOT NULL
-           OR a.ZANNOTATIONNOTE IS NOT NULL
-        ORDER BY a.ZANNOTATIONCREATIONDATE ASC
-    """)
-    
-    rows = cursor.fetchall()
-    conn.close()
+    annotations_by_book = defaultdict(list)
+    for asset_id, annotation in iter_annotations():
+        annotations_by_book[asset_id].append(annotation)
+    
+    return dict(annotations_by_book)
+
+
+def get_annotations_for(asset_ids: set[str]) -> dict[str, list[dict]]:
+    """
+    Get annotations for a set of books, grouped by asset_id
+    
+    Only rows of the requested books are read from SQLite, via
+    ZANNOTATIONASSETID IN (...).
+    
+    Args:
+        asset_ids: Book Asset IDs
+        
+    Returns:
+        dict: Key is asset_id, value is the list of annotations for that book
+    """
+    if not asset_ids:
+        return {}
     
+    placeholders = ", ".join("?" * len(asset_ids))
     annotations_by_book = defaultdict(list)
-    for row in rows:
-        highlight, note, created_at, asset_id, title, author = row
-        if asset_id:
-            annotations_by_book[asset_id].append({
-                "text": highlight or "",
-                "note": note or "",
-                "created_at": convert_apple_time(created_at),
-                "title": title,
-                "author": author,
-            })
+    for asset_id, annotation in _iter_annotations(f"AND a.ZANNOTATIONASSETID IN ({placeholders})", tuple(asset_ids)):
+        annotations_by_book[asset_id].append(annotation)
     
     return dict(annotations_by_book)
 
 
-def get_annotations_by_asset_id(asset_id: str) -> list[dict]:
+def get_annotations_for_asset(asset_id: str) -> list[dict]:
+    """
+    Get annotations for a specific book straight from SQLite
+    
+    Filters on ZANNOTATIONASSETID in the query instead of scanning
+    every annotation in the library.
+    
+    Args:
+        asset_id: Book Asset ID
+        
+    Returns:
+        List of annotations for that book
+    """
+    return [annotation for _, annotation in iter_annotations(asset_id)]
+
+
+def get_annotations_by_asset_id(
+    asset_id: str,
+    all_annotations: dict[str, list[dict]] | None = None,
+) -> list[dict]:
     """
     Get annotations for a specific book
     
     Args:
         asset_id: Book Asset ID
+        all_annotations: Preloaded result of get_all_annotations(), reused if given
         
     Returns:
         List of annotations for that book
     """
-    all_annotations = get_all_annotations()
+    if all_annotations is None:
+        return get_annotations_for_asset(asset_id)
     return all_annotations.get(asset_id, [])
 
 
@@ -108,9 +191,10 @@ def print_annotations(annotations_by_book: dict[str, list[dict]]) -> None:
         print("No annotations found")
         return
     
+    lines = []
     total_count = sum(len(anns) for anns in annotations_by_book.values())
-    print(f"Total found {total_count} annotations from {len(annotations_by_book)} books\n")
-    print("=" * 100)
+    lines.append(f"Total found {total_count} annotations from {len(annotations_by_book)} books\n")
+    lines.append("=" * 100)
     
     for book_idx, (asset_id, annotations) in enumerate(annotations_by_book.items(), 1):
         if not annotations:
@@ -119,30 +203,32 @@ def print_annotations(annotations_by_book: dict[str, list[dict]]) -> None:
         title = annotations[0].get("title", "Unknown Book")
         author = annotations[0].get("author", "Unknown Author")
         
-        print(f"\n📚 [{book_idx}] {title}")
-        print(f"   Author: {author}")
-        print(f"   Asset ID: {asset_id}")
-        print(f"   Total {len(annotations)} annotations")
-        print("=" * 100)
+        lines.append(f"\n📚 [{book_idx}] {title}")
+        lines.append(f"   Author: {author}")
+        lines.append(f"   Asset ID: {asset_id}")
+        lines.append(f"   Total {len(annotations)} annotations")
+        lines.append("=" * 100)
         
         for ann_idx, ann in enumerate(annotations, 1):
             created_str = ann.get("created_at", "N/A")
             
-            print(f"\n  [{ann_idx}] Created At: {created_str}")
+            lines.append(f"\n  [{ann_idx}] Created At: {created_str}")
             
             if ann.get("text"):
-                print(f"  📝 Highlight:")
+                lines.append(f"  📝 Highlight:")
                 for line in ann["text"].split('\n'):
-                    print(f"     {line}")
+                    lines.append(f"     {line}")
             
             if ann.get("note"):
-                print(f"  💭 Note:")
+                lines.append(f"  💭 Note:")
                 for line in ann["note"].split('\n'):
-                    print(f"     {line}")
+                    lines.append(f"     {line}")
             
-            print("  " + "-" * 96)
+            lines.append("  " + "-" * 96)
         
-        print("\n" + "=" * 100)
+        lines.append("\n" + "=" * 100)
+    
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 if __name__ == "__main__":
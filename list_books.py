@@ -1,20 +1,11 @@
 """
 List Books - Read Apple Books book list
 """
-import sqlite3
+import sys
+from contextlib import closing
 from pathlib import Path
-from datetime import datetime
 
-
-def convert_apple_time(timestamp):
-    """Apple timestamp conversion function"""
-    if not timestamp:
-        return None
-    apple_epoch = datetime(2001, 1, 1)
-    unix_epoch = datetime(1970, 1, 1)
-    offset = (apple_epoch - unix_epoch).total_seconds()
-    created_datetime = datetime.fromtimestamp(timestamp + offset)
-    return created_datetime.strftime("%Y-%m-%d %H:%M:%S")
+from apple_books_db import apple_time_sql, open_readonly
 
 
 def get_library_db_path() -> Path:
@@ -36,30 +27,29 @@ def get_all_books() -> list[dict]:
         Book list, each containing asset_id, title, author, etc.
     """
     library_db_path = get_library_db_path()
-    conn = sqlite3.connect(library_db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT
-            ZTITLE,
-            ZAUTHOR,
-            ZKIND,
-            ZLANGUAGE,
-            ZPAGECOUNT,
-            ZREADINGPROGRESS,
-            ZLASTOPENDATE,
-            ZCREATIONDATE,
-            ZISFINISHED,
-            ZASSETID,
-            ZGENRE,
-            ZYEAR
-        FROM ZBKLIBRARYASSET
-        WHERE ZTITLE IS NOT NULL
-        ORDER BY ZLASTOPENDATE DESC NULLS LAST
-    """)
-    
-    rows = cursor.fetchall()
-    conn.close()
+    with closing(open_readonly(library_db_path)) as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(f"""
+            SELECT
+                ZTITLE,
+                ZAUTHOR,
+                ZKIND,
+                ZLANGUAGE,
+                ZPAGECOUNT,
+                ZREADINGPROGRESS,
+                {apple_time_sql("ZLASTOPENDATE")},
+                {apple_time_sql("ZCREATIONDATE")},
+                ZISFINISHED,
+                ZASSETID,
+                ZGENRE,
+                ZYEAR
+            FROM ZBKLIBRARYASSET
+            WHERE ZTITLE IS NOT NULL
+            ORDER BY ZLASTOPENDATE DESC NULLS LAST
+        """)
+        
+        rows = cursor.fetchall()
     
     books = []
     for row in rows:
@@ -73,8 +63,8 @@ def get_all_books() -> list[dict]:
             "language": language,
             "page_count": page_count,
             "reading_progress": reading_progress,
-            "last_open": convert_apple_time(last_open),
-            "created": convert_apple_time(created),
+            "last_open": last_open,
+            "created": created,
             "is_finished": bool(is_finished),
             "genre": genre,
             "year": year,
@@ -89,56 +79,59 @@ def print_books(books: list[dict]) -> None:
         print("No books found")
         return
     
-    print(f"Total found {len(books)} books\n")
-    print("=" * 120)
+    lines = []
+    lines.append(f"Total found {len(books)} books\n")
+    lines.append("=" * 120)
     
     for idx, book in enumerate(books, 1):
-        print(f"\n📚 [{idx}] {book['title']}")
-        print(f"   Author: {book['author']}")
+        lines.append(f"\n📚 [{idx}] {book['title']}")
+        lines.append(f"   Author: {book['author']}")
         
         if book['kind']:
-            print(f"   Kind: {book['kind']}")
+            lines.append(f"   Kind: {book['kind']}")
         
         if book['language']:
-            print(f"   Language: {book['language']}")
+            lines.append(f"   Language: {book['language']}")
         
         if book['page_count']:
-            print(f"   Page Count: {book['page_count']}")
+            lines.append(f"   Page Count: {book['page_count']}")
         
         if book['reading_progress'] is not None:
             progress_percent = book['reading_progress'] * 100
-            print(f"   Reading Progress: {progress_percent:.1f}%")
+            lines.append(f"   Reading Progress: {progress_percent:.1f}%")
         
         if book['is_finished']:
-            print(f"   Status: ✅ Finished")
+            lines.append(f"   Status: ✅ Finished")
         elif book['reading_progress'] and book['reading_progress'] > 0:
-            print(f"   Status: 📖 Reading")
+            lines.append(f"   Status: 📖 Reading")
         else:
-            print(f"   Status: 🆕 Not started")
+            lines.append(f"   Status: 🆕 Not started")
         
         if book['last_open']:
-            print(f"   Last Opened: {book['last_open']}")
+            lines.append(f"   Last Opened: {book['last_open']}")
         
         if book['genre']:
-            print(f"   Genre: {book['genre']}")
+            lines.append(f"   Genre: {book['genre']}")
         
         if book['year']:
-            print(f"   Year: {book['year']}")
+            lines.append(f"   Year: {book['year']}")
         
-        print(f"   Asset ID: {book['asset_id']}")
-        print("-" * 120)
+        lines.append(f"   Asset ID: {book['asset_id']}")
+        lines.append("-" * 120)
     
     # Statistics
-    print(f"\n\n📊 Statistics:")
-    print(f"   Total Books: {len(books)}")
+    lines.append(f"\n\n📊 Statistics:")
+    lines.append(f"   Total Books: {len(books)}")
     
     finished_count = sum(1 for b in books if b['is_finished'])
     reading_count = sum(1 for b in books if b['reading_progress'] and b['reading_progress'] > 0 and not b['is_finished'])
     not_started_count = len(books) - finished_count - reading_count
     
-    print(f"   Finished: {finished_count}")
-    print(f"   Reading: {reading_count}")
-    print(f"   Not Started: {not_started_count}")
+    lines.append(f"   Finished: {finished_count}")
+    lines.append(f"   Reading: {reading_count}")
+    lines.append(f"   Not Started: {not_started_count}")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 if __name__ == "__main__":
@@ -2,21 +2,59 @@
 Logseq Sync - Encapsulate Logseq API operations
 """
 import os
+import random
+import sys
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Any
-from pathlib import Path
 
 try:
-    from dotenv import load_dotenv
-    env_path = Path(__file__).parent / ".env"
-    load_dotenv(dotenv_path=env_path)
+    import orjson
 except ImportError:
-    pass
+    orjson = None
+
+
+# Number of books synced concurrently unless LOGSEQ_SYNC_WORKERS says otherwise
+DEFAULT_SYNC_WORKERS = 4
+
+# Seconds to wait for a regular API call, and for a (large) insertBatchBlock payload
+DEFAULT_TIMEOUT = 10
+BATCH_TIMEOUT = 30
+
+# Top-level blocks sent per insertBatchBlock call, keeping payloads and latency bounded
+BATCH_CHUNK_SIZE = 200
+
+
+# Books are synced from several threads, so each message is written as one locked line
+_output_lock = threading.Lock()
+
+
+def _print(message: str) -> None:
+    """Print a message without interleaving it with other threads' output"""
+    with _output_lock:
+        sys.stdout.write(message + "\n")
+        sys.stdout.flush()
+
+
+class BackoffJitterRetry(Retry):
+    """Retry policy adding up to 20% random jitter to the exponential backoff"""
+    
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, 0.2 * backoff)
 
 
 class LogseqClient:
     """Logseq API Client"""
     
+    # Messages for HTTP status codes that need a specific hint
+    HTTP_ERROR_MESSAGES = {
+        401: "❌ Logseq API authentication failed. Please check your LOGSEQ_TOKEN environment variable.",
+    }
+    
     def __init__(self, url: str | None = None, token: str | None = None):
         self.url = url or os.environ.get("LOGSEQ_URL", "http://127.0.0.1:12315/api")
         self.token = token or os.environ.get("LOGSEQ_TOKEN", "")
@@ -24,50 +62,113 @@ class LogseqClient:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.token}"
         }
+        # Reuse keep-alive connections across calls instead of reconnecting per request
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        # Retry transient failures with backoff. Read errors are not retried because
+        # Logseq may already have applied a non-idempotent call such as insertBatchBlock.
+        retry = BackoffJitterRetry(
+            total=3,
+            read=0,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Pages already fetched or created during this run, keyed by page name
+        self._page_cache: dict[str, dict] = {}
+        # None until check_connection() runs; False once the API is known to be unusable
+        self._ready: bool | None = None
     
-    def call(self, method: str, *args) -> Any | None:
+    def call(self, method: str, *args, timeout: float = DEFAULT_TIMEOUT) -> Any | None:
         """Call Logseq API"""
+        return self._call(method, *args, timeout=timeout)[1]
+    
+    def _call(self, method: str, *args, timeout: float = DEFAULT_TIMEOUT) -> tuple[bool, Any | None]:
+        """
+        Call Logseq API, telling a failed request apart from a null result
+        
+        Returns:
+            (ok, result): ok is False when the request failed; result is None on
+            failure and for methods that legitimately return null
+        """
+        if self._ready is False:
+            return False, None
+        
         payload = {
             "method": method,
             "args": list(args)
         }
         try:
-            response = requests.post(self.url, headers=self.headers, json=payload, timeout=10)
+            if orjson is not None:
+                # Content-Type is already set on the session headers
+                response = self._session.post(self.url, data=orjson.dumps(payload), timeout=timeout)
+                response.raise_for_status()
+                return True, orjson.loads(response.content)
+            response = self._session.post(self.url, json=payload, timeout=timeout)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            print("❌ Unable to connect to Logseq API. Please ensure Logseq is running and the API is enabled.")
-            return None
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 401:
-                print("❌ Logseq API authentication failed. Please check your LOGSEQ_TOKEN environment variable.")
-            else:
-                print(f"❌ Logseq API error: {e}")
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Logseq API request failed: {e}")
-            return None
+            return True, response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # ValueError covers orjson.JSONDecodeError for a non-JSON response body
+            _print(self._describe_error(e))
+            return False, None
+    
+    def close(self) -> None:
+        """Close the pooled HTTP connections"""
+        self._session.close()
+    
+    def _describe_error(self, error: Exception) -> str:
+        """Build the error message for a failed call, failing fast on unrecoverable errors"""
+        if isinstance(error, requests.exceptions.ConnectionError):
+            self._ready = False
+            return "❌ Unable to connect to Logseq API. Please ensure Logseq is running and the API is enabled."
+        
+        if isinstance(error, requests.exceptions.HTTPError):
+            status_code = error.response.status_code
+            if status_code == 401:
+                self._ready = False
+            return self.HTTP_ERROR_MESSAGES.get(status_code, f"❌ Logseq API error: {error}")
+        
+        return f"❌ Logseq API request failed: {error}"
     
     def check_connection(self) -> bool:
         """Check API connection"""
+        self._ready = None
         result = self.call("logseq.App.getInfo")
         if result:
-            print(f"✅ Connected to Logseq")
+            self._ready = True
+            _print(f"✅ Connected to Logseq")
             return True
+        self._ready = False
         return False
     
     def get_page(self, page_name: str) -> dict | None:
-        """Get page info"""
-        return self.call("logseq.Editor.getPage", page_name)
+        """Get page info (cached for the lifetime of the client)"""
+        page = self._page_cache.get(page_name)
+        if page is None:
+            page = self.call("logseq.Editor.getPage", page_name)
+            if page:
+                self._page_cache[page_name] = page
+        return page
     
     def create_page(self, page_name: str, properties: dict | None = None) -> dict | None:
         """Create a new page"""
-        return self.call(
+        page = self.call(
             "logseq.Editor.createPage",
             page_name,
             properties or {},
             {"createFirstBlock": False}
         )
+        if page:
+            self._page_cache[page_name] = page
+        return page
+    
+    def delete_page(self, page_name: str) -> None:
+        """Delete a page together with all of its blocks"""
+        self._page_cache.pop(page_name, None)
+        self.call("logseq.Editor.deletePage", page_name)
     
     def get_page_blocks(self, page_name: str) -> list | None:
         """Get all blocks of a page"""
@@ -102,11 +203,16 @@ class LogseqClient:
         Returns:
             Created block info
         """
-        return self.call(
+        return self._insert_batch_block(parent_uuid, batch_blocks)[1]
+    
+    def _insert_batch_block(self, parent_uuid: str, batch_blocks: list[dict]) -> tuple[bool, Any | None]:
+        """insert_batch_block returning (ok, result) as _call does"""
+        return self._call(
             "logseq.Editor.insertBatchBlock",
             parent_uuid,
             batch_blocks,
-            {"sibling": True}
+            {"sibling": True},
+            timeout=BATCH_TIMEOUT,
         )
     
     def update_page_content(self, page_name: str, content: str) -> bool:
@@ -115,57 +221,104 @@ class LogseqClient:
         
         Supports using tab indentation for sub-blocks
         """
-        page = self.get_page(page_name)
-        if not page:
-            page = self.create_page(page_name)
-            if not page:
-                print(f"❌ Unable to create page: {page_name}")
-                return False
+        batch_blocks = self._parse_content_to_blocks(content)
+        return self.replace_page_blocks(page_name, batch_blocks)
+    
+    def replace_page_blocks(self, page_name: str, batch_blocks: list[dict]) -> bool:
+        """
+        Replace all blocks of a page
         
-        blocks = self.get_page_blocks(page_name)
-        if blocks:
-            for block in blocks:
-                if block.get("uuid"):
-                    self.delete_block(block["uuid"])
+        The page is rewritten with deletePage (for an existing page), createPage
+        and insertBatchBlock, so the page gets a new uuid and creation time on every
+        sync and page-level state such as favourites may be lost. Pages with more
+        than BATCH_CHUNK_SIZE top-level blocks are inserted in chunks, each appended
+        after the last top-level block of the previous chunk. That block is taken
+        from the insertBatchBlock result, or read back from the page when Logseq
+        returns null.
         
-        batch_blocks = self._parse_content_to_blocks(content)
+        Args:
+            page_name: Page name
+            batch_blocks: List of IBatchBlock to put on the page
+            
+        Returns:
+            Whether successful
+        """
+        # Only delete pages that exist: Logseq may never answer deletePage for a missing page
+        if self.get_page(page_name):
+            self.delete_page(page_name)
+        page = self.create_page(page_name)
+        if not page:
+            _print(f"❌ Unable to create page: {page_name}")
+            return False
         
-        if batch_blocks:
-            self.insert_batch_block(page.get("uuid"), batch_blocks)
+        target_uuid = page.get("uuid")
+        for start in range(0, len(batch_blocks), BATCH_CHUNK_SIZE):
+            chunk = batch_blocks[start:start + BATCH_CHUNK_SIZE]
+            # Logseq may answer a successful insert with null, so only a failed request counts
+            ok, inserted = self._insert_batch_block(target_uuid, chunk)
+            if not ok:
+                _print(f"❌ Unable to insert blocks into page: {page_name}")
+                return False
+            
+            if start + BATCH_CHUNK_SIZE < len(batch_blocks):
+                target_uuid = self._last_top_level_uuid(inserted) or self._last_page_block_uuid(page_name)
+                if not target_uuid:
+                    _print(f"❌ Unable to read back blocks of page: {page_name}")
+                    return False
+        
+        # Logseq may reassign page metadata after the rewrite, so refetch next time
+        self._page_cache.pop(page_name, None)
         
         return True
     
+    def _last_page_block_uuid(self, page_name: str) -> str | None:
+        """Read back the uuid of the last top-level block of a page"""
+        page_blocks = self.get_page_blocks(page_name)
+        return page_blocks[-1].get("uuid") if page_blocks else None
+    
+    @staticmethod
+    def _last_top_level_uuid(inserted: Any) -> str | None:
+        """
+        Find the last top-level block among blocks returned by insertBatchBlock
+        
+        When Logseq returns the inserted blocks they come flattened in tree order,
+        so the last entry may be a nested child; top-level blocks all share the
+        parent of the first returned block. Some Logseq versions return null
+        instead, in which case None is returned and the caller reads the page back.
+        """
+        if not isinstance(inserted, list) or not inserted:
+            return None
+        top_parent = inserted[0].get("parent")
+        for block in reversed(inserted):
+            if block.get("parent") == top_parent:
+                return block.get("uuid")
+        return None
+    
     def _parse_content_to_blocks(self, content: str) -> list[dict]:
         """
         Parse markdown content into IBatchBlock structure
         
-        Supports multi-level indentation (Tab or 2 spaces)
+        Supports multi-level indentation (Tab or 2 spaces). The style is decided
+        per line: highlight and note text is inserted as-is, so a page can mix
+        the template's indentation with whitespace from the book itself.
         """
         lines = content.strip().split("\n")
         root_blocks = []
         stack = [] 
         
         for line in lines:
-            indent_level = 0
-            leading_ws = line[:len(line) - len(line.lstrip())]
-            
-            if "\t" in leading_ws:
-                indent_level = leading_ws.count("\t")
-            else:
-                indent_level = len(leading_ws) // 2
-            
-            # DEBUG: comments out after fix
-            # print(f"DEBUG: Line='{leading_ws}{line.lstrip()[:20]}...', Level={indent_level}, StackLen={len(stack)}")
-            
             stripped = line.lstrip()
+            ws_len = len(line) - len(stripped)
             
-            if stripped.startswith("- "):
-                stripped = stripped[2:]
+            # Tabs win if any are present in the indent, otherwise 2 spaces per level
+            indent_level = line.count("\t", 0, ws_len) or ws_len // 2
             
-            if not stripped.strip():
+            # Drop the bullet marker; skip lines left with no content
+            stripped = stripped.removeprefix("- ")
+            if not stripped or stripped.isspace():
                 continue
             
-            new_block = {"content": stripped, "children": []}
+            new_block = {"content": stripped}
             
             if indent_level == 0:
                 root_blocks.append(new_block)
@@ -178,7 +331,7 @@ class LogseqClient:
                 if stack:
                     # Found parent, add to children
                     parent_block = stack[-1][1]
-                    parent_block["children"].append(new_block)
+                    parent_block.setdefault("children", []).append(new_block)
                     # Push self to stack as it might be a parent for the next level
                     stack.append((indent_level, new_block))
                 else:
@@ -186,19 +339,28 @@ class LogseqClient:
                     root_blocks.append(new_block)
                     stack = [(indent_level, new_block)]
         
-        # Cleanup empty children recursive
-        self._cleanup_empty_children(root_blocks)
-        
         return root_blocks
 
-    def _cleanup_empty_children(self, blocks: list[dict]) -> None:
-        """Recursively cleanup empty children fields"""
-        for block in blocks:
-            if "children" in block:
-                if not block["children"]:
-                    del block["children"]
-                else:
-                    self._cleanup_empty_children(block["children"])
+
+def get_sync_workers() -> int:
+    """
+    Read the number of books synced concurrently from LOGSEQ_SYNC_WORKERS
+    
+    Returns:
+        The configured number, or DEFAULT_SYNC_WORKERS when unset or not a positive integer
+    """
+    value = os.environ.get("LOGSEQ_SYNC_WORKERS", "").strip()
+    if not value:
+        return DEFAULT_SYNC_WORKERS
+    
+    try:
+        workers = int(value)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        _print(f"⚠️  LOGSEQ_SYNC_WORKERS must be a positive integer, got {value!r}; using {DEFAULT_SYNC_WORKERS}")
+        return DEFAULT_SYNC_WORKERS
+    return workers
 
 
 def sync_book_to_logseq(client: LogseqClient, page_name: str, content: str) -> bool:
@@ -213,11 +375,38 @@ def sync_book_to_logseq(client: LogseqClient, page_name: str, content: str) -> b
     Returns:
         Whether successful
     """
-    print(f"📖 Syncing book: {page_name}")
+    _print(f"📖 Syncing book: {page_name}")
     
     if client.update_page_content(page_name, content):
-        print(f"  ✅ Sync success")
+        _print(f"  ✅ Sync success: {page_name}")
         return True
     else:
-        print(f"  ❌ Sync failed")
+        _print(f"  ❌ Sync failed: {page_name}")
         return False
+
+
+def sync_books_to_logseq(
+    client: LogseqClient,
+    jobs: list[tuple[str, str]],
+    max_workers: int | None = None,
+) -> list[bool]:
+    """
+    Sync several books to Logseq concurrently
+    
+    Each book is synced by sync_book_to_logseq from a thread pool sharing the
+    client's session, so its messages are printed as the book is worked on.
+    
+    Args:
+        client: Logseq client
+        jobs: List of (page_name, content) pairs
+        max_workers: Maximum number of books synced at the same time,
+            defaults to get_sync_workers()
+        
+    Returns:
+        Whether each job was successful, in the same order as jobs
+    """
+    if max_workers is None:
+        max_workers = get_sync_workers()
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda job: sync_book_to_logseq(client, *job), jobs))
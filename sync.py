@@ -3,7 +3,10 @@
 Apple Books to Logseq Sync Tool
 Sync highlights from Apple Books to Logseq
 """
+import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
 from books_manager import (
@@ -15,9 +18,10 @@ from books_manager import (
     TARGET_BOOKS_FILE,
 )
 from list_books import get_all_books
-from list_all_note import get_all_annotations
+from list_all_note import get_annotations_for
 from template_engine import generate_page_content, save_default_template
-from logseq_sync import LogseqClient, sync_book_to_logseq
+from logseq_sync import LogseqClient, get_sync_workers, sync_books_to_logseq
+from sync_state import load_state, save_state, content_hash
 
 
 def init_target_books() -> bool:
@@ -39,12 +43,42 @@ def init_target_books() -> bool:
     return True
 
 
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Sync highlights from Apple Books to Logseq")
+    parser.add_argument(
+        "--refresh-books",
+        action="store_true",
+        help="re-scan the Apple Books library and update target_books.json before syncing",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-sync every book, even if its page content has not changed since the last sync",
+    )
+    return parser.parse_args()
+
+
+def load_env() -> None:
+    """Load environment variables from .env next to this script, if python-dotenv is available"""
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(dotenv_path=Path(__file__).parent / ".env")
+
+
 def main():
+    args = parse_args()
+    load_env()
+    
     print("=" * 60)
     print("🔄 Apple Books → Logseq Sync Tool")
     print("=" * 60)
     print()
     
+    sync_workers = get_sync_workers()
+    
     if not TARGET_BOOKS_FILE.exists():
         print("⚠️  target_books.json not found, initializing...")
         if not init_target_books():
@@ -55,30 +89,38 @@ def main():
     
     save_default_template()
     
-    print("📚 Updating book list from Apple Books...")
-    try:
-        apple_books = get_all_books()
-        print(f"   Read {len(apple_books)} books from Apple Books")
-    except RuntimeError as e:
-        print(f"❌ {e}")
-        sys.exit(1)
-    
-    merged_books = sync_from_apple_books(apple_books)
-    save_target_books(merged_books)
-    print(f"✅ Updated {TARGET_BOOKS_FILE}")
-    print()
-    
     print("🔌 Connecting to Logseq API...")
     client = LogseqClient()
+    books_future = None
+    if args.refresh_books:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Scan the Apple Books library in the background while Logseq answers
+            books_future = executor.submit(get_all_books)
+            connected = client.check_connection()
+    else:
+        connected = client.check_connection()
+    print()
     
-    if not client.check_connection():
+    if books_future is not None:
+        print("📚 Updating book list from Apple Books...")
+        try:
+            apple_books = books_future.result()
+            print(f"   Read {len(apple_books)} books from Apple Books")
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        
+        merged_books = sync_from_apple_books(apple_books)
+        save_target_books(merged_books)
+        print(f"✅ Updated {TARGET_BOOKS_FILE}")
         print()
+    
+    if not connected:
         print("Tip: Please confirm the following:")
         print("  1. Logseq is running")
         print("  2. Developer Mode is enabled in Settings → Advanced")
         print("  3. LOGSEQ_TOKEN is set in .env file")
         sys.exit(1)
-    print()
     
     books_to_sync = get_books_to_sync()
     
@@ -92,7 +134,7 @@ def main():
     
     print("📝 Reading Apple Books annotations...")
     try:
-        all_annotations = get_all_annotations()
+        all_annotations = get_annotations_for({book["asset_id"] for book in books_to_sync})
         total_annotations = sum(len(anns) for anns in all_annotations.values())
         print(f"   Total {total_annotations} annotations")
     except RuntimeError as e:
@@ -103,9 +145,12 @@ def main():
     print("🚀 Starting sync...")
     print("-" * 60)
     
-    success_count = 0
-    fail_count = 0
+    state = load_state()
+    today = datetime.now().strftime("%Y-%m-%d")
+    unchanged_count = 0
     
+    jobs = []
+    pending_states = []
     for book in books_to_sync:
         asset_id = book["asset_id"]
         page_name = get_page_name(book)
@@ -118,21 +163,45 @@ def main():
             print(f"⚠️  {title}: No annotations, skipping")
             continue
         
+        # Keep the first sync date so unchanged highlights render identical content
+        previous = state.get(asset_id, {})
+        sync_date = previous.get("sync_date") or today
+        
         content = generate_page_content(
             title=title,
             author=author,
             highlights=annotations,
+            sync_date=sync_date,
         )
         
-        if sync_book_to_logseq(client, page_name, content):
-            success_count += 1
-        else:
-            fail_count += 1
+        digest = content_hash(content)
+        if (
+            not args.force
+            and previous.get("hash") == digest
+            and previous.get("page_name") == page_name
+        ):
+            print(f"⏭️  {title}: Unchanged since last sync, skipping")
+            unchanged_count += 1
+            continue
+        
+        jobs.append((page_name, content))
+        pending_states.append((asset_id, {"page_name": page_name, "sync_date": sync_date, "hash": digest}))
+    
+    results = sync_books_to_logseq(client, jobs, max_workers=sync_workers)
+    client.close()
+    success_count = sum(results)
+    fail_count = len(results) - success_count
+    
+    for (asset_id, book_state), success in zip(pending_states, results):
+        if success:
+            state[asset_id] = book_state
+    save_state(state)
     
     print("-" * 60)
     print()
     print("📊 Sync completed!")
     print(f"   ✅ Success: {success_count}")
+    print(f"   ⏭️  Unchanged: {unchanged_count}")
     print(f"   ❌ Failed: {fail_count}")
 
 
@@ -0,0 +1,31 @@
+"""
+Sync State - Remember what was last synced to Logseq in .sync_state.json
+"""
+import hashlib
+import json
+from pathlib import Path
+
+
+SYNC_STATE_FILE = Path(__file__).parent / ".sync_state.json"
+
+
+def load_state() -> dict[str, dict]:
+    """
+    Load .sync_state.json
+    
+    Returns:
+        dict: Key is asset_id, value contains page_name, sync_date and hash of the last synced page
+    """
+    if not SYNC_STATE_FILE.exists():
+        return {}
+    return json.loads(SYNC_STATE_FILE.read_bytes())
+
+
+def save_state(state: dict[str, dict]) -> None:
+    """Save .sync_state.json"""
+    SYNC_STATE_FILE.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def content_hash(content: str) -> str:
+    """Fingerprint page content (blake2b is faster than md5/sha1 for this size)"""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
@@ -1,7 +1,9 @@
 """
 Template Engine - Parse and render Logseq template
 """
+import re
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
@@ -21,11 +23,19 @@ DEFAULT_TEMPLATE = """\
 TEMPLATE_FILE = Path(__file__).parent / "template.md"
 
 
+@lru_cache(maxsize=4)
+def _read_template(path: Path, mtime_ns: int) -> str:
+    """Read a template file; mtime_ns is part of the cache key so edits are picked up"""
+    return path.read_text(encoding="utf-8")
+
+
 def load_template() -> str:
     """Load template, use default if not exists"""
-    if TEMPLATE_FILE.exists():
-        return TEMPLATE_FILE.read_text(encoding="utf-8")
-    return DEFAULT_TEMPLATE
+    try:
+        mtime_ns = TEMPLATE_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return DEFAULT_TEMPLATE
+    return _read_template(TEMPLATE_FILE, mtime_ns)
 
 
 def save_default_template() -> None:
@@ -34,6 +44,88 @@ def save_default_template() -> None:
         TEMPLATE_FILE.write_text(DEFAULT_TEMPLATE, encoding="utf-8")
 
 
+LOOP_START = "{% for highlight in highlights %}"
+LOOP_END = "{% endfor %}"
+
+# Splits template text into alternating literal text and tags:
+# variables like {{ title }}, conditionals {% if highlight.note %} and {% endif %}
+TAG_PATTERN = re.compile(r"(\{\{ [\w.]+ \}\}|\{% if [\w.]+ %\}|\{% endif %\})")
+
+
+@lru_cache(maxsize=8)
+def _compile_template(template: str) -> tuple[tuple[str, ...], tuple[str, ...] | None, tuple[str, ...]]:
+    """
+    Tokenize a template around its highlights loop
+    
+    Cached by template source, so a template is scanned once per process
+    instead of once per rendered book or highlight.
+    
+    Args:
+        template: Template string
+        
+    Returns:
+        Segments (before, loop, after); loop is None when the template has no loop.
+        Each segment alternates literal text (even indices) and tags (odd indices).
+    """
+    start_idx = template.find(LOOP_START)
+    end_idx = template.find(LOOP_END)
+    if start_idx == -1 or end_idx == -1:
+        return tuple(TAG_PATTERN.split(template)), None, ()
+    
+    return (
+        tuple(TAG_PATTERN.split(template[:start_idx])),
+        tuple(TAG_PATTERN.split(template[start_idx + len(LOOP_START):end_idx])),
+        tuple(TAG_PATTERN.split(template[end_idx + len(LOOP_END):])),
+    )
+
+
+# Returned by _lookup when a name does not resolve, as opposed to a None value
+_MISSING = object()
+
+
+def _lookup(name: str, context: dict) -> Any:
+    """Resolve a dotted name like highlight.note against the render context"""
+    value = context
+    for key in name.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
+
+def _render_segments(segments: tuple[str, ...], context: dict) -> str:
+    """
+    Render tokenized template segments into a single string
+    
+    Output pieces are collected in a list and joined once, instead of
+    copying the whole text on every substitution.
+    """
+    parts = []
+    skip_depth = 0
+    for idx, segment in enumerate(segments):
+        if idx % 2 == 0:
+            if not skip_depth:
+                parts.append(segment)
+        elif segment == "{% endif %}":
+            if skip_depth:
+                skip_depth -= 1
+        elif segment.startswith("{% if "):
+            if skip_depth:
+                skip_depth += 1
+            else:
+                value = _lookup(segment[6:-3], context)
+                if value is _MISSING or not value:
+                    skip_depth += 1
+        elif not skip_depth:
+            value = _lookup(segment[3:-3], context)
+            if value is _MISSING:
+                # Unknown variable or missing field: leave it in place, as written
+                parts.append(segment)
+            else:
+                parts.append("" if value is None else str(value))
+    return "".join(parts)
+
+
 def render_template(
     template: str,
     title: str,
@@ -57,68 +149,31 @@ def render_template(
     if sync_date is None:
         sync_date = datetime.now().strftime("%Y-%m-%d")
     
-    result = template
+    context = {
+        "author": author or "Unknown",
+        "title": title or "Unknown",
+        "sync_date": sync_date,
+    }
     
-    result = result.replace("{{ author }}", author or "Unknown")
-    result = result.replace("{{ title }}", title or "Unknown")
-    result = result.replace("{{ sync_date }}", sync_date)
+    before, loop_segments, after = _compile_template(template)
     
-    if "{% for highlight in highlights %}" in result:
-        start_marker = "{% for highlight in highlights %}"
-        end_marker = "{% endfor %}"
-        
-        start_idx = result.find(start_marker)
-        end_idx = result.find(end_marker)
-        
-        if start_idx != -1 and end_idx != -1:
-            before = result[:start_idx]
-            loop_template = result[start_idx + len(start_marker):end_idx]
-            after = result[end_idx + len(end_marker):]
-            
-            rendered_highlights = []
-            for h in highlights:
-                item = loop_template
-                
-                item = item.replace("{{ highlight.text }}", h.get("text", ""))
-                
-                if "{% if highlight.page %}" in item:
-                    page_start = "{% if highlight.page %}"
-                    page_end = "{% endif %}"
-                    ps = item.find(page_start)
-                    pe = item.find(page_end, ps)
-                    if ps != -1 and pe != -1:
-                        page_content = item[ps + len(page_start):pe]
-                        if h.get("page"):
-                            page_content = page_content.replace("{{ highlight.page }}", str(h["page"]))
-                        else:
-                            page_content = ""
-                        item = item[:ps] + page_content + item[pe + len(page_end):]
-                
-                if "{% if highlight.note %}" in item:
-                    note_start = "{% if highlight.note %}"
-                    note_end = "{% endif %}"
-                    ns = item.find(note_start)
-                    ne = item.find(note_end, ns)
-                    if ns != -1 and ne != -1:
-                        note_content = item[ns + len(note_start):ne]
-                        if h.get("note"):
-                            note_content = note_content.replace("{{ highlight.note }}", h["note"])
-                        else:
-                            note_content = ""
-                        item = item[:ns] + note_content + item[ne + len(note_end):]
-                
-                rendered_highlights.append(item.strip('\n'))
-            
-            result = before + "\n".join(rendered_highlights) + after
+    result = _render_segments(before, context)
+    if loop_segments is not None:
+        if highlights:
+            result += "\n".join(
+                _render_segments(loop_segments, {**context, "highlight": h}).strip("\n")
+                for h in highlights
+            )
+        result += _render_segments(after, context)
     
-    lines = [line for line in result.split("\n") if line.strip()]
-    return "\n".join(lines)
+    return "\n".join(line for line in result.split("\n") if line.strip())
 
 
 def generate_page_content(
     title: str,
     author: str,
     highlights: list[dict],
+    sync_date: str | None = None,
 ) -> str:
     """
     Generate complete Logseq page content
@@ -127,9 +182,10 @@ def generate_page_content(
         title: Title
         author: Author
         highlights: Highlight list
+        sync_date: Sync date, defaults to today
         
     Returns:
         Logseq page content
     """
     template = load_template()
-    return render_template(template, title, author, highlights)
+    return render_template(template, title, author, highlights, sync_date)